@@ -2,15 +2,17 @@
 """
 FreeSurfer to OBJ Converter
 Converts FreeSurfer brain data (surfaces and segmentations) to OBJ format
-for use in the Three.js Brain Viewer application.
+(or binary glTF with --format glb) for use in the Three.js Brain Viewer application.
 
 Requirements:
     - nibabel
     - numpy
-    - trimesh (optional, for mesh optimization)
+    - trimesh (optional, for mesh optimization and glb output)
+    - numba (optional, JIT-compiles dual contouring vertex refinement and the
+      subcortical bounding box pass)
 
 Usage:
-    python freesurfer_to_obj.py <freesurfer_subject_dir> <output_dir>
+    python freesurfer_to_obj.py <freesurfer_subject_dir> <output_dir> [--format glb]
 
 Example:
     python preprocessing/freesurfer_to_obj.py data/raw/112_bl src/assets/models
@@ -20,6 +22,7 @@ import os
 import sys
 import argparse
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 try:
@@ -29,15 +32,183 @@ except ImportError:
     print("Error: nibabel is required. Install with: pip install nibabel")
     sys.exit(1)
 
+# Subcortical meshing dependencies, imported once here rather than in every mesh call
+try:
+    import trimesh
+    from skimage import measure
+    from scipy.ndimage import binary_erosion, find_objects, sobel
+except ImportError:
+    trimesh = None
+
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+
+def _write_obj(output_file, vertices, faces, header):
+    """
+    Write vertices and 1-indexed faces to an OBJ file
+
+    Each block is formatted by a single %-operation over a repeated line template,
+    which runs in C instead of once per row (as np.savetxt does), and the file is
+    opened in binary mode to bypass the text codec layer.
+    """
+    with open(output_file, 'wb', buffering=1 << 20) as f:
+        f.write(header.encode('utf-8'))
+        f.write((('v %.6f %.6f %.6f\n' * len(vertices)) % tuple(vertices.ravel().tolist())).encode('ascii'))
+        f.write((('f %d %d %d\n' * len(faces)) % tuple(faces.ravel().tolist())).encode('ascii'))
+
+
+def _write_glb(output_file, vertices, faces):
+    """Write vertices and 0-indexed faces to a binary glTF file"""
+    mesh = trimesh.Trimesh(vertices=vertices, faces=faces, process=False, validate=False)
+    mesh.export(output_file, file_type='glb', include_normals=True)
+
+
+if njit is not None:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _refine_verts(verts, grad_x, grad_y, grad_z):
+        """Move vertices half a voxel along the normalized gradient, in place (single fused pass)"""
+        nx, ny, nz = grad_x.shape
+        for n in prange(verts.shape[0]):
+            i = min(max(int(verts[n, 0]), 0), nx - 1)
+            j = min(max(int(verts[n, 1]), 0), ny - 1)
+            k = min(max(int(verts[n, 2]), 0), nz - 1)
+
+            gx = grad_x[i, j, k]
+            gy = grad_y[i, j, k]
+            gz = grad_z[i, j, k]
+            grad_mag = np.sqrt(gx * gx + gy * gy + gz * gz)
+
+            if grad_mag > 0.1:
+                verts[n, 0] += gx / grad_mag * 0.5
+                verts[n, 1] += gy / grad_mag * 0.5
+                verts[n, 2] += gz / grad_mag * 0.5
+else:
+    def _refine_verts(verts, grad_x, grad_y, grad_z):
+        """Move vertices half a voxel along the normalized gradient, in place"""
+        # Get voxel coordinates of every vertex
+        vox_coords = np.clip(verts.astype(np.intp), 0, np.array(grad_x.shape) - 1)
+        i, j, k = vox_coords.T
+
+        # Get gradient at these locations
+        grad = np.stack([grad_x[i, j, k], grad_y[i, j, k], grad_z[i, j, k]], axis=1)
+        grad_mag = np.linalg.norm(grad, axis=1)
+
+        # Adjust vertex positions along gradient
+        ok = grad_mag > 0.1
+        verts[ok] += grad[ok] / grad_mag[ok, None] * 0.5
+
+
+def _marching_cubes_step(mask):
+    """Marching cubes step size for a padded structure mask: 1 for small or thin structures, else 2"""
+    if min(mask.shape) - 2 < 8 or np.count_nonzero(mask) < 4000:
+        return 1
+    # Thin structures (e.g. ventricles, fornix) lose most of their voxels to a single erosion
+    n_core = np.count_nonzero(binary_erosion(mask))
+    return 2 if n_core >= 0.5 * np.count_nonzero(mask) else 1
+
+
+def _marching_cubes(mask, step_size=1):
+    """
+    Marching cubes on a padded mask, sampling every step_size-th voxel
+    
+    Raises:
+        RuntimeError if no surface is found at that sampling
+    """
+    # Pad the far side so the last sampled slice is the empty border and the surface closes
+    if step_size > 1:
+        mask = np.pad(mask, [(0, -(n - 1) % step_size) for n in mask.shape])
+
+    verts, faces, _, _ = measure.marching_cubes(mask, level=0.5, step_size=step_size, allow_degenerate=False)
+    if len(faces) == 0:
+        raise RuntimeError("No surface found at the given step size")
+    return verts, faces
+
+
+if njit is not None:
+    @njit(cache=True)
+    def _label_bbox_kernel(vol, lut, n_labels):
+        """Per-label (imin, imax, jmin, jmax, kmin, kmax), with imax = -1 for absent labels"""
+        nx, ny, nz = vol.shape
+        boxes = np.empty((n_labels, 6), dtype=np.int64)
+        for n in range(n_labels):
+            boxes[n, 0] = nx
+            boxes[n, 1] = -1
+            boxes[n, 2] = ny
+            boxes[n, 3] = -1
+            boxes[n, 4] = nz
+            boxes[n, 5] = -1
+        # Serial on purpose: a parallel kernel would start numba's thread pool,
+        # which makes forking the worker pools afterwards unsafe
+        for i in range(nx):
+            for j in range(ny):
+                for k in range(nz):
+                    v = vol[i, j, k]
+                    if v < 0 or v >= lut.shape[0]:
+                        continue
+                    n = lut[v]
+                    if n < 0:
+                        continue
+                    boxes[n, 0] = min(boxes[n, 0], i)
+                    boxes[n, 1] = max(boxes[n, 1], i)
+                    boxes[n, 2] = min(boxes[n, 2], j)
+                    boxes[n, 3] = max(boxes[n, 3], j)
+                    boxes[n, 4] = min(boxes[n, 4], k)
+                    boxes[n, 5] = max(boxes[n, 5], k)
+        return boxes
+
+    def _label_bboxes(vol, labels):
+        """
+        Bounding box of each label in a single pass over an integer volume (numba kernel,
+        which only tracks the requested labels instead of building slices for all of them)
+        
+        Returns:
+            dict of label -> tuple of slices (or None if the label is absent)
+        """
+        # MGZ volumes are stored big-endian, which numba cannot compile for
+        vol = vol.astype(vol.dtype.newbyteorder('='), copy=False)
+        lut = np.full(max(labels) + 1, -1, dtype=np.int64)
+        lut[list(labels)] = np.arange(len(labels))
+        boxes = _label_bbox_kernel(vol, lut, len(labels))
+        return {
+            label: None if box[1] < 0 else tuple(slice(int(lo), int(hi) + 1) for lo, hi in box.reshape(3, 2))
+            for label, box in zip(labels, boxes)
+        }
+else:
+    def _label_bboxes(vol, labels):
+        """
+        Bounding box of each label in a single pass over an integer volume
+    
+        Returns:
+            dict of label -> tuple of slices (or None if the label is absent)
+        """
+        slices = find_objects(vol, max_label=max(labels))
+        return {label: slices[label - 1] for label in labels}
+
 
 class FreeSurferConverter:
     """Convert FreeSurfer data to OBJ format for Three.js visualization"""
     
-    def __init__(self, subject_dir, output_dir):
+    def __init__(self, subject_dir, output_dir, max_workers=None, output_format='obj'):
         self.subject_dir = Path(subject_dir)
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
         
+        # 'obj' (text) or 'glb' (binary glTF; smaller and faster for Three.js to load)
+        if output_format not in ('obj', 'glb'):
+            raise ValueError(f"Unknown output format '{output_format}', expected 'obj' or 'glb'")
+        if output_format == 'glb' and trimesh is None:
+            raise ImportError("trimesh is required for glb output. Install with: pip install trimesh")
+        self.output_format = output_format
+        
+        # Worker processes for independent surfaces/regions/structures (None = all CPUs)
+        self.max_workers = max_workers or os.cpu_count()
+        
+        # Parsed surfaces keyed by resolved path, shared across conversions
+        self._surf_cache = {}
+        
         # FreeSurfer standard directories
         self.surf_dir = self.subject_dir / 'surf'
         self.mri_dir = self.subject_dir / 'mri'
@@ -54,6 +225,36 @@ class FreeSurferConverter:
         else:
             raise FileNotFoundError(f"{surface_file} not found")
 
+    def _process_pool(self):
+        """Worker pool for independent conversions"""
+        return ProcessPoolExecutor(max_workers=self.max_workers)
+
+    def _read_geometry(self, surface_file):
+        """Read a FreeSurfer surface, memoized by resolved path (callers must not modify the arrays)"""
+        key = Path(surface_file).resolve()
+        if key not in self._surf_cache:
+            vertices, faces = read_geometry(surface_file)
+            # float32 is all Three.js keeps, and the OBJ output is only written to 6 decimals
+            self._surf_cache[key] = (vertices.astype(np.float32), faces)
+        return self._surf_cache[key]
+
+    def _surface_obj_data(self, surface_file, flip_faces=False):
+        """Read a surface and return the (vertices, 1-indexed faces, header) to write as OBJ"""
+        # Read FreeSurfer surface geometry
+        vertices, faces = self._read_geometry(surface_file)
+        
+        # FreeSurfer uses 0-indexed faces, OBJ uses 1-indexed
+        faces = faces + 1
+        
+        # Optionally flip faces for correct normals
+        if flip_faces:
+            faces = faces[:, [0, 2, 1]]
+        
+        header = (
+            "# OBJ file generated from FreeSurfer surface\n"
+            f"# Source: {surface_file}\n\n"
+        )
+        return vertices, faces, header
         
     def convert_surface_to_obj(self, surface_file, output_file, flip_faces=False):
         """
@@ -67,28 +268,10 @@ class FreeSurferConverter:
         print(f"Converting {surface_file} to {output_file}...")
         
         try:
-            # Read FreeSurfer surface geometry
-            vertices, faces = read_geometry(surface_file)
-            
-            # FreeSurfer uses 0-indexed faces, OBJ uses 1-indexed
-            faces = faces + 1
-            
-            # Optionally flip faces for correct normals
-            if flip_faces:
-                faces = faces[:, [0, 2, 1]]
+            vertices, faces, header = self._surface_obj_data(surface_file, flip_faces)
             
             # Write OBJ file
-            with open(output_file, 'w') as f:
-                f.write("# OBJ file generated from FreeSurfer surface\n")
-                f.write(f"# Source: {surface_file}\n\n")
-                
-                # Write vertices
-                for v in vertices:
-                    f.write(f"v {v[0]:.6f} {v[1]:.6f} {v[2]:.6f}\n")
-                
-                # Write faces
-                for face in faces:
-                    f.write(f"f {face[0]} {face[1]} {face[2]}\n")
+            _write_obj(output_file, vertices, faces, header)
             
             print(f"Successfully created {output_file}")
             print(f"  Vertices: {len(vertices)}, Faces: {len(faces)}")
@@ -108,18 +291,35 @@ class FreeSurferConverter:
             ('rh.inflated', 'rh_inflated.obj')
         ]
         
-        for surf_name, obj_name in surfaces:
-            surf_file = self.surf_dir / surf_name
-            try:
-                surf_file = self._get_surface_file(surf_file)
-                output_file = self.output_dir / obj_name
-                self.convert_surface_to_obj(surf_file, output_file)
-            except FileNotFoundError:
-                print(f"Warning: {surf_file} not found, skipping...")
+        # Surfaces are read here (and cached for the parcellation pass),
+        # while the OBJ writing is spread across worker processes
+        with self._process_pool() as executor:
+            futures = []
+            for surf_name, obj_name in surfaces:
+                surf_file = self.surf_dir / surf_name
+                try:
+                    surf_file = self._get_surface_file(surf_file)
+                    output_file = (self.output_dir / obj_name).with_suffix(f'.{self.output_format}')
+                    print(f"Converting {surf_file} to {output_file}...")
+                    if self.output_format == 'glb':
+                        vertices, faces = self._read_geometry(surf_file)
+                        future = executor.submit(_write_glb, output_file, vertices, faces)
+                    else:
+                        vertices, faces, header = self._surface_obj_data(surf_file)
+                        future = executor.submit(_write_obj, output_file, vertices, faces, header)
+                    futures.append((output_file, len(vertices), len(faces), future))
+                except FileNotFoundError:
+                    print(f"Warning: {surf_file} not found, skipping...")
+            
+            for output_file, n_vertices, n_faces, future in futures:
+                future.result()
+                print(f"Successfully created {output_file}")
+                print(f"  Vertices: {n_vertices}, Faces: {n_faces}")
     
     def convert_parcellated_regions(self, hemisphere='lh', annot_name='aparc'):
         """
         Convert individual parcellated regions to separate OBJ files
+        (or to a single glb scene per hemisphere, one named node per region)
         
         Args:
             hemisphere: 'lh' or 'rh'
@@ -131,7 +331,7 @@ class FreeSurferConverter:
         surf_file = self.surf_dir / f'{hemisphere}.pial'
         surf_file = self._get_surface_file(surf_file)
         
-        vertices, faces = read_geometry(surf_file)
+        vertices, faces = self._read_geometry(surf_file)
         
         # Read annotation
         annot_file = self.label_dir / f'{hemisphere}.{annot_name}.annot'
@@ -142,10 +342,25 @@ class FreeSurferConverter:
         labels, ctab, names = read_annot(annot_file)
         
         # Create output directory for parcellations
+        # (glb output collects every region into one scene, so the viewer fetches one file per hemisphere)
         parc_dir = self.output_dir / 'parcellations' / hemisphere
-        parc_dir.mkdir(parents=True, exist_ok=True)
+        scene = trimesh.Scene() if self.output_format == 'glb' else None
+        (parc_dir.parent if scene is not None else parc_dir).mkdir(parents=True, exist_ok=True)
         
-        # Convert each region to a separate OBJ file
+        # Assign every face to the majority label of its three vertices (the first vertex's
+        # label if it matches either other one, otherwise the second's). Boundary faces then
+        # belong to exactly one region instead of being dropped, which left gaps between parcels.
+        face_labels = labels[faces]
+        same_as_first = (face_labels[:, 0] == face_labels[:, 1]) | (face_labels[:, 0] == face_labels[:, 2])
+        face_dominant_label = np.where(same_as_first, face_labels[:, 0], face_labels[:, 1])
+        
+        # Dense old -> new vertex index map, refilled per region (only the current
+        # region's entries are ever read, so stale values from earlier regions are harmless)
+        vertex_mapping = np.full(len(vertices), -1, dtype=np.int32)
+        
+        # Extract each region (vectorized); glb regions go straight into the scene,
+        # while OBJ regions are collected and written by worker processes below
+        obj_regions = []
         for idx, region_name in enumerate(names):
             region_name_str = region_name.decode('utf-8') if isinstance(region_name, bytes) else region_name
             
@@ -153,42 +368,50 @@ class FreeSurferConverter:
             if region_name_str.lower() in ['unknown', 'corpuscallosum']:
                 continue
             
-            # Get vertices belonging to this region
-            region_mask = (labels == idx)
-            region_vertex_indices = np.where(region_mask)[0]
-            
-            if len(region_vertex_indices) == 0:
-                continue
-            
             # Extract faces that belong to this region
-            face_mask = np.isin(faces, region_vertex_indices).all(axis=1)
+            face_mask = (face_dominant_label == idx)
             region_faces = faces[face_mask]
             
             if len(region_faces) == 0:
                 continue
             
-            # Create vertex mapping
-            vertex_mapping = {old_idx: new_idx for new_idx, old_idx in enumerate(region_vertex_indices)}
+            # Get vertices used by this region's faces
+            region_vertex_indices = np.unique(region_faces)
             region_vertices = vertices[region_vertex_indices]
             
             # Remap faces to new vertex indices
-            remapped_faces = np.array([[vertex_mapping[f] for f in face] for face in region_faces])
+            vertex_mapping[region_vertex_indices] = np.arange(len(region_vertex_indices), dtype=np.int32)
+            remapped_faces = vertex_mapping[region_faces]
             
-            # Write OBJ file
-            output_file = parc_dir / f'{region_name_str}.obj'
-            with open(output_file, 'w') as f:
-                f.write(f"# Region: {region_name_str}\n")
-                f.write(f"# Hemisphere: {hemisphere}\n\n")
-                
-                # Write vertices
-                for v in region_vertices:
-                    f.write(f"v {v[0]:.6f} {v[1]:.6f} {v[2]:.6f}\n")
+            if scene is not None:
+                region_mesh = trimesh.Trimesh(vertices=region_vertices, faces=remapped_faces,
+                                              process=False, validate=False)
+                scene.add_geometry(region_mesh, node_name=region_name_str, geom_name=region_name_str)
+                print(f"  Added {region_name_str} ({len(region_vertices)} vertices, {len(remapped_faces)} faces)")
+            else:
+                obj_regions.append((region_name_str, region_vertices, remapped_faces))
+        
+        # Write each region to a separate OBJ file in a worker process
+        if scene is None:
+            with self._process_pool() as executor:
+                futures = []
+                for region_name_str, region_vertices, remapped_faces in obj_regions:
+                    output_file = parc_dir / f'{region_name_str}.obj'
+                    header = (
+                        f"# Region: {region_name_str}\n"
+                        f"# Hemisphere: {hemisphere}\n\n"
+                    )
+                    # Faces are 1-indexed for OBJ
+                    future = executor.submit(_write_obj, output_file, region_vertices, remapped_faces + 1, header)
+                    futures.append((region_name_str, len(region_vertices), len(remapped_faces), future))
                 
-                # Write faces (1-indexed for OBJ)
-                for face in remapped_faces:
-                    f.write(f"f {face[0]+1} {face[1]+1} {face[2]+1}\n")
-            
-            print(f"  Created {region_name_str}.obj ({len(region_vertices)} vertices, {len(remapped_faces)} faces)")
+                for region_name_str, n_vertices, n_faces, future in futures:
+                    future.result()
+                    print(f"  Created {region_name_str}.obj ({n_vertices} vertices, {n_faces} faces)")
+        else:
+            output_file = parc_dir.parent / f'{hemisphere}.glb'
+            scene.export(output_file, file_type='glb', include_normals=True)
+            print(f"  Created {output_file.name} ({len(scene.geometry)} regions)")
     
     def convert_subcortical_segmentation(self, mode='marching_cubes', smoothing=True):
         """
@@ -249,11 +472,12 @@ class FreeSurferConverter:
             255: "CC_Anterior",
         }
 
-        # Load segmentation volume
+        # Load segmentation volume in its native integer dtype
+        # (get_fdata() would upcast the whole volume to float64 for plain label comparisons)
         aseg_img = nib.load(aseg_file)
-        aseg_data = aseg_img.get_fdata()
+        aseg_data = np.asanyarray(aseg_img.dataobj)
         brainmask_img = nib.load(brainmask_file)
-        brainmask_data = brainmask_img.get_fdata()
+        brainmask_data = np.asanyarray(brainmask_img.dataobj)
 
         print("Note: For optimal results, use FreeSurfer's mri_tessellate:")
         for label_id, structure_name in subcortical_structures.items():
@@ -262,110 +486,123 @@ class FreeSurferConverter:
         
         # Alternative: Use marching cubes for subcortical mesh generation
         print(f"\nGenerating subcortical meshes using {mode}...")
-        from skimage import measure
-        import trimesh
-        from scipy.ndimage import binary_closing, binary_opening
+        if trimesh is None:
+            raise ImportError("trimesh, scikit-image and scipy are required for subcortical meshes. "
+                              "Install with: pip install -r requirements.txt")
 
         subcort_dir = self.output_dir / 'subcortical'
         subcort_dir.mkdir(parents=True, exist_ok=True)
 
-        for label_id, structure_name in subcortical_structures.items():
-            print(f"Processing {structure_name}...")
+        # Bounding box of every subcortical label in a single pass over the volume,
+        # so each structure is meshed on a tight sub-volume instead of the full 256^3
+        if not np.issubdtype(aseg_data.dtype, np.integer):
+            aseg_data = aseg_data.astype(np.int32)
+        label_slices = _label_bboxes(aseg_data, list(subcortical_structures))
 
-            # Create binary mask for this structure
-            mask = (aseg_data == label_id)
+        if mode not in ('marching_cubes', 'dual_contouring'):
+            print(f"Error: Unknown mode '{mode}'")
+            return
 
-            if not mask.any():
+        # Crop every structure's mask up front so the full volumes can be released
+        # before meshing; workers then only ever touch the small ROI arrays
+        structure_masks = []
+        for label_id, structure_name in subcortical_structures.items():
+            roi = label_slices[label_id]
+            if roi is None:
                 print(f"  Warning: No voxels found for {structure_name}")
                 continue
 
+            # Create binary mask for this structure, padded by one voxel so the surface closes
+            mask = np.pad(aseg_data[roi] == label_id, 1)
+            offset = np.array([s.start for s in roi]) - 1
+
             # Special case: WM-hypointensities contains noisy outliers outside brain
             if structure_name == 'WM-hypointensities':
                 # erase outliers by masking with brainmask
-                mask = np.logical_and(mask, brainmask_data > 0)
-                mask = np.where(brainmask_data, 1, 0).astype(np.uint8)
-
-
-            # Generate mesh based on mode
-            if mode == 'marching_cubes':
-                mesh = self._marching_cubes_mesh(mask, smoothing)
-            elif mode == 'dual_contouring':
-                mesh = self._dual_contouring_mesh(mask, smoothing)
-            else:
-                print(f"  Error: Unknown mode '{mode}'")
-                continue
-
-            # Write OBJ file
-            output_file = subcort_dir / f'{structure_name}.obj'
-            try:
-                mesh.export(output_file, file_type='obj')
-                verts = len(mesh.vertices)
-                faces = len(mesh.faces)
-                print(f"  Created {structure_name}.obj ({verts} vertices, {faces} faces)")
-            except Exception as e:
-                print(f"  Error saving OBJ file for {structure_name}: {e}")
-
-    def _marching_cubes_mesh(self, mask, smoothing=False):
-        """Generate mesh using marching cubes algorithm"""
-        import trimesh
-        from skimage import measure
-
+                roi_brainmask = np.pad(brainmask_data[roi], 1)
+                mask = np.logical_and(mask, roi_brainmask > 0)
+                mask = np.where(roi_brainmask, 1, 0).astype(np.uint8)
+
+            structure_masks.append((structure_name, mask, offset))
+
+        del aseg_data, brainmask_data
+
+        # Structures are independent, so mesh them in parallel worker processes
+        with self._process_pool() as executor:
+            futures = []
+            for structure_name, mask, offset in structure_masks:
+                print(f"Processing {structure_name}...")
+
+                # Coarse marching cubes is enough for bulky structures; small or thin ones
+                # would break up at step_size=2, so they keep full resolution
+                step_size = _marching_cubes_step(mask)
+
+                # Generate mesh and write OBJ file
+                output_file = subcort_dir / f'{structure_name}.{self.output_format}'
+                future = executor.submit(_mesh_structure, mask, offset, output_file, mode, smoothing, step_size)
+                futures.append((structure_name, future))
+
+            for structure_name, future in futures:
+                try:
+                    verts, faces = future.result()
+                    print(f"  Created {structure_name}.{self.output_format} ({verts} vertices, {faces} faces)")
+                except Exception as e:
+                    print(f"  Error converting {structure_name}: {e}")
+
+    @staticmethod
+    def _marching_cubes_mesh(mask, smoothing=False, step_size=1):
+        """Generate mesh using marching cubes algorithm (step_size > 1 samples every n-th voxel)"""
         # Extract mesh using marching cubes
-        verts, faces, _, _ = measure.marching_cubes(mask, level=0.5)
-
-        # Create a trimesh object
-        mesh = trimesh.Trimesh(vertices=verts, faces=faces)
+        try:
+            verts, faces = _marching_cubes(mask, step_size)
+        except RuntimeError:
+            if step_size == 1:
+                raise
+            # Too thin to survive coarse sampling after all; fall back to full resolution
+            step_size = 1
+            verts, faces = _marching_cubes(mask, step_size)
+
+        # Create a trimesh object; marching cubes output has no duplicate vertices to merge,
+        # so skip processing/validation and the cache invalidation it triggers
+        mesh = trimesh.Trimesh(vertices=verts, faces=faces, process=False, validate=False)
         # Invert normals (marching cubes produces inward-facing normals)
         mesh.invert()
 
         if smoothing:
-            # Apply Taubin smoothing (avoids shrinkage)
-            trimesh.smoothing.filter_taubin(mesh, iterations=30)
-            # Decimate mesh to reduce complexity
-            try:
-                mesh = mesh.simplify_quadric_decimation(face_count=int(len(mesh.faces) * 0.5))
-            except Exception as e:
-                print(f"  Error: Mesh decimation failed: {e}\n Note: could be missing fast-simplification package, can pip install fast-simplification")
+            # Apply Taubin smoothing (avoids shrinkage); nu keeps 1/lamb - 1/nu within (0, 0.1).
+            # trimesh subtracts nu on the dilation pass, so it takes the positive value of the usual -0.52
+            trimesh.smoothing.filter_taubin(mesh, lamb=0.5, nu=0.52, iterations=12)
+            # Decimate mesh to reduce complexity (a coarse step_size has already done so)
+            if step_size == 1:
+                try:
+                    mesh = mesh.simplify_quadric_decimation(face_count=int(len(mesh.faces) * 0.5))
+                except Exception as e:
+                    print(f"  Error: Mesh decimation failed: {e}\n Note: could be missing fast-simplification package, can pip install fast-simplification")
 
         return mesh
 
-    def _dual_contouring_mesh(self, mask, smoothing=False):
+    @staticmethod
+    def _dual_contouring_mesh(mask, smoothing=False):
         """Generate mesh using dual contouring algorithm with gradient-based vertex positioning"""
-        import trimesh
-        from skimage import measure
-        from scipy.ndimage import sobel
+        # Convert to float for gradient computation; the mask is already cropped to the
+        # structure's padded bounding box, and float32 halves the sobel memory traffic
+        mask_float = mask.astype(np.float32)
 
-
-        # Convert to float for gradient computation
-        mask_float = mask.astype(float)
-
-        # Compute gradient field
-        grad_x = sobel(mask_float, axis=0)
-        grad_y = sobel(mask_float, axis=1)
-        grad_z = sobel(mask_float, axis=2)
+        # Compute gradient field (zero outside the crop, matching the empty padding)
+        grad_x = sobel(mask_float, axis=0, mode='constant')
+        grad_y = sobel(mask_float, axis=1, mode='constant')
+        grad_z = sobel(mask_float, axis=2, mode='constant')
 
         # Extract initial mesh using marching cubes
         verts, faces, _, _ = measure.marching_cubes(mask, level=0.5, gradient_direction='descent')
+        # float32 keeps the refinement pass (and its numba kernel) on one dtype
+        verts = verts.astype(np.float32, copy=False)
 
         # Improve vertex positions using gradient information
-        for i in range(len(verts)):
-            # Get voxel coordinates
-            vox_coord = verts[i].astype(int)
-            vox_coord = np.clip(vox_coord, [0, 0, 0], np.array(mask.shape) - 1)
-
-            # Get gradient at this location
-            gx = grad_x[tuple(vox_coord)]
-            gy = grad_y[tuple(vox_coord)]
-            gz = grad_z[tuple(vox_coord)]
-            grad_mag = np.sqrt(gx**2 + gy**2 + gz**2)
-
-            # Adjust vertex position along gradient
-            if grad_mag > 0.1:
-                grad_norm = np.array([gx, gy, gz]) / grad_mag
-                verts[i] += grad_norm * 0.5
+        _refine_verts(verts, grad_x, grad_y, grad_z)
 
         # Create trimesh object
-        mesh = trimesh.Trimesh(vertices=verts, faces=faces)
+        mesh = trimesh.Trimesh(vertices=verts, faces=faces, process=False, validate=False)
         mesh.invert()
 
         if smoothing:
@@ -391,7 +628,30 @@ class FreeSurferConverter:
         self.convert_subcortical_segmentation(mode='marching_cubes')
         
         print("\nConversion complete!")
-        print(f"OBJ files saved to: {self.output_dir}")
+        print(f"{self.output_format.upper()} files saved to: {self.output_dir}")
+
+
+def _mesh_structure(mask, offset, output_file, mode, smoothing, step_size=1):
+    """
+    Mesh one subcortical structure and write it to an OBJ/glb file (run in a worker process)
+    
+    Returns:
+        (vertex count, face count) of the written mesh
+    """
+    # Generate mesh based on mode
+    if mode == 'marching_cubes':
+        mesh = FreeSurferConverter._marching_cubes_mesh(mask, smoothing, step_size)
+    else:
+        mesh = FreeSurferConverter._dual_contouring_mesh(mask, smoothing)
+
+    # Move the mesh from ROI coordinates back into volume coordinates
+    mesh.apply_translation(offset)
+
+    if output_file.suffix == '.glb':
+        mesh.export(output_file, file_type='glb', include_normals=True)
+    else:
+        mesh.export(output_file, file_type='obj')
+    return len(mesh.vertices), len(mesh.faces)
 
 
 def main():
@@ -411,6 +671,18 @@ def main():
         action='store_true',
         help='Convert only parcellated regions'
     )
+    parser.add_argument(
+        '--format',
+        choices=['obj', 'glb'],
+        default='obj',
+        help='Output mesh format: text OBJ or binary glTF (default: obj)'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=None,
+        help='Number of worker processes (default: number of CPUs)'
+    )
     
     args = parser.parse_args()
     
@@ -431,7 +703,8 @@ def main():
                     shutil.rmtree(item)
 
     # Create converter and run
-    converter = FreeSurferConverter(args.subject_dir, args.output_dir)
+    converter = FreeSurferConverter(args.subject_dir, args.output_dir, max_workers=args.workers,
+                                    output_format=args.format)
     
     if args.parcellations_only:
         for hemi in ['lh', 'rh']:
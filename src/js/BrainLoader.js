@@ -1,17 +1,24 @@
 import * as THREE from 'three';
 import { OBJLoader } from 'three/examples/jsm/loaders/OBJLoader.js';
 import { PLYLoader } from 'three/examples/jsm/loaders/PLYLoader.js';
+import { GLTFLoader } from 'three/examples/jsm/loaders/GLTFLoader.js';
 
 /**
  * BrainLoader - Handles loading and processing of brain mesh data
- * Supports OBJ and PLY formats from FreeSurfer preprocessing
+ * Supports OBJ, PLY and binary glTF (GLB) formats from FreeSurfer preprocessing
  */
 
 export class BrainLoader {
-  constructor(scene) {
+  /**
+   * @param {THREE.Scene} scene - Scene to add loaded structures to
+   * @param {string} meshFormat - 'obj' or 'glb', matching freesurfer_to_obj.py --format
+   */
+  constructor(scene, meshFormat = 'obj') {
     this.scene = scene;
+    this.meshFormat = meshFormat;
     this.objLoader = new OBJLoader();
     this.plyLoader = new PLYLoader();
+    this.gltfLoader = new GLTFLoader();
     this.loadingManager = new THREE.LoadingManager();
     
     this.setupLoadingManager();
@@ -37,7 +44,7 @@ export class BrainLoader {
   }
 
     /**
-   * Load a single mesh file (OBJ or PLY)
+   * Load a single mesh file (OBJ, PLY or GLB)
    * @param {string} path - Path to the mesh file
    * @param {string} name - Display name for the structure
    * @param {number} color - Hex color for the mesh
@@ -48,12 +55,16 @@ export class BrainLoader {
       const fileExtension = path.split('.').pop().toLowerCase();
       
       // Determine loader based on file extension
-      const loader = fileExtension === 'ply' ? this.plyLoader : this.objLoader;
+      const loader = fileExtension === 'ply' ? this.plyLoader
+        : fileExtension === 'glb' ? this.gltfLoader
+        : this.objLoader;
       
       loader.load(
         path,
-        (loadedObject) => {
+        (loaded) => {
           let mesh;
+          // GLTF loader returns a result object wrapping the scene
+          const loadedObject = fileExtension === 'glb' ? loaded.scene : loaded;
           
           if (fileExtension === 'ply') {
             // PLY loader returns geometry directly
@@ -61,7 +72,7 @@ export class BrainLoader {
             const material = this.createMaterial(color);
             mesh = new THREE.Mesh(geometry, material);
           } else {
-            // OBJ loader returns a group/object
+            // OBJ/GLTF loaders return a group/object
             mesh = loadedObject;
             
             // Apply material to all children
@@ -156,8 +167,8 @@ export class BrainLoader {
    */
   async loadCorticalSurfaces(brainStructures) {
     const surfaceConfigs = [
-      { name: 'Left Hemisphere', path: 'assets/models/lh_pial.obj', color: 0xffa07a },
-      { name: 'Right Hemisphere', path: 'assets/models/rh_pial.obj', color: 0x87ceeb }
+      { name: 'Left Hemisphere', path: `assets/models/lh_pial.${this.meshFormat}`, color: 0xffa07a },
+      { name: 'Right Hemisphere', path: `assets/models/rh_pial.${this.meshFormat}`, color: 0x87ceeb }
     ];
 
     const loadPromises = surfaceConfigs.map(config => 
@@ -228,7 +239,7 @@ export class BrainLoader {
 
     const loadPromises = subcorticalStructures.map(structure => 
       this.loadMesh(
-        `assets/models/subcortical/${structure.name}.obj`,
+        `assets/models/subcortical/${structure.name}.${this.meshFormat}`,
         structure.name,
         structure.color,
         brainStructures
@@ -251,6 +262,39 @@ export class BrainLoader {
 
 
 
+  /**
+   * Load one hemisphere's parcellated regions from a single GLB scene,
+   * where each region is a mesh node named after the region
+   * @param {string} path - Path to the hemisphere GLB file
+   * @param {Array} regions - Region configs ({ region, color, hemisphere }) in this hemisphere
+   * @param {Object} brainStructures - Reference to store loaded structures
+   */
+  async loadParcellationScene(path, regions, brainStructures) {
+    const gltf = await this.gltfLoader.loadAsync(path);
+
+    regions.forEach(config => {
+      const mesh = gltf.scene.getObjectByName(config.region);
+      if (!mesh) {
+        console.warn(`Region ${config.region} not found in ${path}`);
+        return;
+      }
+
+      const name = `${config.hemisphere}_${config.region}`;
+      mesh.material = this.createMaterial(config.color);
+      mesh.castShadow = true;
+      mesh.receiveShadow = true;
+      mesh.name = name;
+      mesh.userData.name = name;
+      mesh.userData.originalColor = config.color;
+
+      // Re-parent from the GLTF scene to the main scene
+      this.scene.add(mesh);
+      brainStructures[name] = mesh;
+    });
+
+    console.log(`Loaded: ${path}`);
+  }
+
   /**
    * Load individual parcellated regions from FreeSurfer annotation
    * @param {Object} brainStructures - Reference to store loaded structures
@@ -304,14 +348,23 @@ export class BrainLoader {
 
     console.log('Loading cortical parcellated regions...');
     
-    const loadPromises = allRegions.map(config => 
-      this.loadMesh(
-        `assets/models/parcellations/${config.hemisphere}/${config.region}.obj`,
-        `${config.hemisphere}_${config.region}`,
-        config.color,
-        brainStructures
+    // GLB output packs each hemisphere into one scene; OBJ output has one file per region
+    const loadPromises = this.meshFormat === 'glb'
+      ? ['lh', 'rh'].map(hemisphere =>
+        this.loadParcellationScene(
+          `assets/models/parcellations/${hemisphere}.glb`,
+          allRegions.filter(config => config.hemisphere === hemisphere),
+          brainStructures
+        )
       )
-    );
+      : allRegions.map(config => 
+        this.loadMesh(
+          `assets/models/parcellations/${config.hemisphere}/${config.region}.obj`,
+          `${config.hemisphere}_${config.region}`,
+          config.color,
+          brainStructures
+        )
+      );
 
     try {
       await Promise.all(loadPromises);
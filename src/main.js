@@ -30,6 +30,7 @@ class BrainViewer {
     this.showSubcortical = false;
 
     this.loadParcellations = true; // Set to true to load parcellated regions, else load whole hemispheres
+    this.meshFormat = 'obj'; // 'glb' for models converted with freesurfer_to_obj.py --format glb
     
     this.init();
   }
@@ -43,7 +44,7 @@ class BrainViewer {
     this.setupEventListeners();
     
     // Initialize loaders and GUI
-    this.brainLoader = new BrainLoader(this.scene);
+    this.brainLoader = new BrainLoader(this.scene, this.meshFormat);
     console.log('BrainLoader initialized');
     this.dataLoader = new DataLoader();
     this.guiController = new GUIController(this.brainStructures, this.dataLoader);